@@ -3,7 +3,7 @@ import selectors, socket, types
 import ledconfig, ledconn
 
 class Ledclient:
-    def __init__(self):
+    def __init__(self, sel=None, binary=False):
         self.host = None
         self.port = None
         self.inbound = ""
@@ -11,10 +11,18 @@ class Ledclient:
         self.is_outbound_empty = True
         self.ready = False
 
+        # Binary framing: asked for if `binary` and ledhost allows it, used
+        # for outbound messages once asked for (is_binary), and for inbound
+        # messages once ledhost agreed (records).
+        self.want_binary = binary
+        self.host_binary = False
+        self.is_binary = False
+        self.records = None
+
         #self.DEBUG = True
         self.DEBUG = False
 
-        self.sel = selectors.DefaultSelector()
+        self.sel = sel or selectors.DefaultSelector()
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.setblocking(False)
 
@@ -27,7 +35,8 @@ class Ledclient:
         self.port = port
         self.socket.connect_ex((host, port))
         data = types.SimpleNamespace(
-            inbound="",
+            client=self,
+            inbound=b"",
             outbound=b""
         )
         self.DEBUG and print(f"[ledclient.py connect] Connected to {host}:{port}.")
@@ -40,28 +49,42 @@ class Ledclient:
 
         return self
 
-    def loop_once(self):
-        events = self.sel.select(timeout=None)
+    def loop_once(self, timeout=None):
+        events = self.sel.select(timeout=timeout)
         for key, mask in events:
             self.handle_connection(key, mask)
         return self
 
+    def close(self):
+        try:
+            self.sel.unregister(self.socket)
+        except (KeyError, ValueError):
+            pass
+        self.socket.close()
+        return self
+
     def handle_connection(self, key, mask):
         data = key.data
         if mask & selectors.EVENT_READ:
             inbound = self.socket.recv(1024)
             if inbound:
-                data.inbound += inbound.decode()
-                while "\n" in data.inbound or "\r" in data.inbound:
-                    eol = data.inbound.find("\n")
-                    eol = eol if eol != -1 else data.inbound.find("\r")
-                    line = data.inbound[0:eol].strip()
+                data.inbound += inbound
+                while self.records is None \
+                and (b"\n" in data.inbound or b"\r" in data.inbound):
+                    eol = data.inbound.find(b"\n")
+                    eol = eol if eol != -1 else data.inbound.find(b"\r")
+                    line = data.inbound[0:eol].decode().strip()
+                    data.inbound = data.inbound[eol+1:]
                     if line:
-                        data.inbound = data.inbound[eol+1:]
                         self.handle_message(ledconn.MessageParser().parse(line))
+                if self.records is not None:
+                    self.records.feed(data.inbound)
+                    data.inbound = b""
+                    for rec_type, payload in self.records.records():
+                        self.handle_record(rec_type, payload)
 
             else:
-                self.socket.close()
+                self.close()
                 self.on_disconnect()
                 raise Exception("Connection closed")
 
@@ -73,6 +96,22 @@ class Ledclient:
                 sent = self.socket.send(self.outbound)
                 self.outbound = self.outbound[sent:]
                 self.is_outbound_empty = len(self.outbound) == 0
+            self.update_events()
+
+    def update_events(self):
+        """ Only waits for the socket to be writable while there's something
+            to write, so that select() doesn't return right away when idle.
+        """
+        events = selectors.EVENT_READ
+        if self.outbound:
+            events |= selectors.EVENT_WRITE
+        try:
+            key = self.sel.get_key(self.socket)
+        except (KeyError, ValueError):
+            return self
+        if key.events != events:
+            self.sel.modify(self.socket, events, key.data)
+        return self
 
     def handle_message(self, message):
         msg_type = message.type()[1:]
@@ -83,14 +122,35 @@ class Ledclient:
             f"on_message",
         ])
 
+        if message.prefixes() == ":hi:config":
+            self.host_binary = "binary" in message and message["binary"]
         if message.prefixes() == ":hi:welcome":
             self.ready = True
+            self.want_binary and self.host_binary and self.request_binary()
+        if message.prefixes() == ":hi:binary":
+            self.records = ledconn.RecordParser()
 
         for h in handlers:
             if hasattr(self, h) and callable(getattr(self, h)):
                 getattr(self, h)(message)
                 break
 
+    def handle_record(self, rec_type, payload):
+        if rec_type == ledconn.REC_ACK:
+            (status,) = ledconn.S_ACK.unpack_from(payload)
+            freetext = bytes(payload[ledconn.S_ACK.size:]).decode()
+            self.handle_message(ledconn.Message(
+                ledconn.ACK_TYPES[status], "", set(), {}, [], freetext
+            ))
+        elif rec_type == ledconn.REC_TEXT:
+            line = bytes(payload).decode()
+            self.handle_message(ledconn.MessageParser().parse(line))
+
+    def request_binary(self):
+        self.queue_message(ledconn.Message("hi", "binary", set(), {}, [], ""))
+        self.is_binary = True
+        return self
+
     def on_connect(self):
         print(f"[ledclient.py] Connected to {self.host} {self.port}.")
 
@@ -105,8 +165,55 @@ class Ledclient:
         print(f"[ledclient.py] Unhandled message:")
         print(message.report())
 
+    def queue_message(self, message):
+        if self.is_binary:
+            self.outbound += ledconn.pack_message(message)
+        else:
+            self.outbound += bytes(str(message).encode("utf-8"))
+        return self.update_events()
+
+    def led_message(self, objects, rgb, keep_alive=None, **flags):
+        values = {"rgb": list(rgb)}
+        keep_alive is None or values.update(keepalive=keep_alive)
+        return ledconn.Message(
+            "led", "", set(objects), values,
+            [f"&{f}" if v else f"!{f}" for f, v in flags.items()], ""
+        )
+
+    def queue_led(self, objects, rgb, keep_alive=None, **flags):
+        return self.queue_message(
+            self.led_message(objects, rgb, keep_alive, **flags)
+        )
+
+    def queue_frame(self, rgbs, keep_alive=None, **flags):
+        """ Sets objects #0, #1, ... to the given rgb values. """
+        packed_flags = ledconn.pack_flags(flags)
+        fits = packed_flags is not None \
+            and all(len(rgb) == 3 for rgb in rgbs) \
+            and all(isinstance(c, int) and 0 <= c <= 255
+                    for rgb in rgbs for c in rgb) \
+            and (keep_alive is None
+                 or isinstance(keep_alive, int)
+                 and 0 <= keep_alive < ledconn.KEEP_ALIVE_DEFAULT)
+        if self.is_binary and fits:
+            self.outbound += ledconn.pack_frame(rgbs, keep_alive, packed_flags)
+            return self.update_events()
+        for objno, rgb in enumerate(rgbs):
+            self.queue_led([objno], rgb, keep_alive, **flags)
+        return self
+
+    def queue_off(self, objects):
+        return self.queue_message(
+            ledconn.Message("off", "", set(objects), {}, [], "")
+        )
+
+    def queue_pop(self, objects):
+        return self.queue_message(
+            ledconn.Message("pop", "", set(objects), {}, [], "")
+        )
+
     def send_message(self, message):
-        self.outbound += bytes(str(message).encode("utf-8"))
+        self.queue_message(message)
         self.loop_once()
 
 
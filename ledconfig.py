@@ -29,6 +29,57 @@ if "LEDHOST_PORT" in env: CONNECT_PORT = int(env["LEDHOST_PORT"])
 CONNECT = (CONNECT_HOST, CONNECT_PORT)
 
 
+""" Proxy settings
+    ==============
+
+    The settings in this section pertain to ledproxy, which accepts client
+    connections like ledhost does, and relays their messages to many ledhosts
+    at once over a pool of persistent connections.
+
+    PROXY_HOST:
+    PROXY_PORT:
+        For ledproxy: the hostname and port to listen to.
+        For clients of ledproxy: the hostname and port to connect to.
+
+    PROXY_LEDHOSTS:
+        The ledhosts to relay to, as "host" or "host:port" strings. If no
+        port is given, CONNECT_PORT is used. These strings are also the
+        names clients use to select ledhosts, e.g.:
+
+            @pi-kitchen,pi-hall:5730 :led #0 rgb=255,0,0
+
+        Messages without such a selection are sent to all ledhosts.
+
+        Ledproxy shares a single connection to each ledhost among all of its
+        clients, so it refuses :begin, :commit and :rollback messages: a
+        transaction would capture the messages of every other client too.
+
+    If the environment variables LEDPROXY_HOST, LEDPROXY_PORT and
+    LEDPROXY_LEDHOSTS are defined, the values of those will be used instead
+    of the default values listed here. LEDPROXY_LEDHOSTS is a comma-separated
+    list.
+
+    PROXY_RECONNECT_MIN:
+    PROXY_RECONNECT_MAX:
+        Number of seconds to wait before reconnecting to a ledhost that
+        could not be reached. The wait doubles after every failed attempt,
+        starting at PROXY_RECONNECT_MIN, up to PROXY_RECONNECT_MAX.
+
+    PROXY:
+        For convenience's sake. A tuple of host and port.
+"""
+PROXY_HOST = "localhost"
+PROXY_PORT = 5730
+PROXY_LEDHOSTS = []
+PROXY_RECONNECT_MIN = 0.5
+PROXY_RECONNECT_MAX = 30
+if "LEDPROXY_HOST" in env: PROXY_HOST = env["LEDPROXY_HOST"]
+if "LEDPROXY_PORT" in env: PROXY_PORT = int(env["LEDPROXY_PORT"])
+if "LEDPROXY_LEDHOSTS" in env:
+    PROXY_LEDHOSTS = [h for h in env["LEDPROXY_LEDHOSTS"].split(",") if h]
+PROXY = (PROXY_HOST, PROXY_PORT)
+
+
 """ Pimoroni Blinkt settings
     ========================
 
@@ -51,8 +102,11 @@ BRIGHTNESS = 25
         determine the number of frames to use for their gradients.
 
     FRAME_LENGTH:
-        Convenience variable: length of 1 frame, in seconds, rounded to
-        two decimals.
+        Convenience variable: length of 1 frame, in seconds. Ledhost counts
+        frames of exactly this length since it started, and times fades,
+        blinks and keep alives in whole frames. Send ledhost a :clock message
+        to see how late it notices the start of frames (its jitter); if that
+        is a large part of a frame, consider lowering FPS.
 
     KEEP_ALIVE:
         Number of seconds to wait before expiring a led. When a led
@@ -82,7 +136,7 @@ BRIGHTNESS = 25
         flag to have &blink leds fade-out too.
 """
 FPS=24
-FRAME_LENGTH=round(1/FPS, 2)
+FRAME_LENGTH=1/FPS
 KEEP_ALIVE = 10
 MAX_KEEP_ALIVE = 30
 KEEP_ALIVE_BLINK = 0.3
@@ -140,6 +194,22 @@ ON_EXCEED_MAX_STACK_SIZE = ledutil.ON_EXCEED_DENY
 ON_EXCEED_MAX_PLAN_SIZE = ledutil.ON_EXCEED_DENY
 
 
+""" Transaction settings
+    ====================
+
+    Clients can group :led, :off and :pop messages between a :begin and a
+    :commit message. Those messages are checked and answered with :ok:queued
+    right away, but only take effect at :commit, all at once, in a single
+    frame. If any message in the transaction was rejected, or applying them
+    would exceed MAX_STACK_SIZE, none of them take effect. Send :rollback
+    instead of :commit to drop the transaction.
+
+    MAX_TRANSACTION_SIZE:
+        The maximum number of messages in a single transaction.
+"""
+MAX_TRANSACTION_SIZE = 1000
+
+
 """ Behaviour settings
     ==================
 
@@ -152,9 +222,38 @@ ON_EXCEED_MAX_PLAN_SIZE = ledutil.ON_EXCEED_DENY
         If False, `:led #0 ...` sets Blinkt pixel 0. If True, that same
         message sets Blinkt pixel 7. Useful if your Raspberry Pi is in an
         orientation where pixel 7 is logically the first led.
+
+    BINARY_PROTOCOL:
+        If True, ledhost allows clients to switch their connection to the
+        binary framing described in ledconn.py, which takes less work to
+        decode than lines of text. Clients only ask for it if ledhost allows.
 """
 GREENHACK = True
 SWAP = True
+BINARY_PROTOCOL = True
+
+
+""" Snapshot settings
+    =================
+
+    Ledhost can periodically save the state of every led (active frame,
+    stack, plan and remaining keep-alive) to a compact binary file. On
+    startup, that file is read back, so the leds resume where they left off
+    after a restart or a crash, without clients having to resend anything.
+
+    SNAPSHOT_FILE:
+        Path of the snapshot file. Set to None to disable the feature.
+        If the environment variable LEDHOST_SNAPSHOT is defined, its value
+        will be used instead. Set LEDHOST_SNAPSHOT to an empty string to
+        disable the feature from the environment.
+
+    SNAPSHOT_INTERVAL:
+        Minimal number of seconds between two snapshots. Snapshots are only
+        written when the state of the leds changed since the previous one.
+"""
+SNAPSHOT_FILE = "/var/tmp/ledhost.snapshot"
+SNAPSHOT_INTERVAL = 1
+if "LEDHOST_SNAPSHOT" in env: SNAPSHOT_FILE = env["LEDHOST_SNAPSHOT"] or None
 
 
 """ Heartbeat settings
@@ -1,5 +1,5 @@
 #!/usr/bin/python
-import re
+import re, struct
 from types import SimpleNamespace as ns
 import ledutil
 
@@ -220,7 +220,8 @@ class Message:
         has_objects = len(self._objects) > 0
         if require_objects and not has_objects:
             errors.append("missing required objects")
-        elif has_objects and not require_objects and forbid_unneeded_objects:
+        elif has_objects and not require_objects \
+        and not allow_unneeded_objects:
             errors.append("unneeded objects given")
 
         missing_values = set()
@@ -430,3 +431,180 @@ class MessageParser:
     class ParseError(Exception):
         pass
 
+
+""" Binary framing
+    ==============
+
+    A client may ask ledhost to switch a connection to binary framing by
+    sending a `:hi:binary` message, if ledhost's `:hi:config` message says
+    `binary=on`. Ledhost answers with `:hi:binary` and from then on, both
+    sides exchange records rather than lines of text.
+
+    Every record starts with a little-endian header: the length of the
+    payload (2 bytes) and the record type (1 byte). Messages that have no
+    record type of their own are sent as text records, holding one line.
+    Objects are sent as a bitmask, so only objects #0 to #31 can be used in
+    led, off and pop records.
+"""
+REC_HEADER = struct.Struct("<HB")
+
+REC_LED   = 0x01    # objects, r, g, b, flags, keep alive
+REC_FRAME = 0x02    # flags, keep alive, then r, g, b of objects #0, #1, ...
+REC_OFF   = 0x03    # objects
+REC_POP   = 0x04    # objects
+REC_ACK   = 0x05    # status, then the free text
+REC_TEXT  = 0x7F    # one line of text
+
+S_LED = struct.Struct("<IBBBBB")
+S_FRAME = struct.Struct("<BB")
+S_RGB = struct.Struct("<BBB")
+S_OBJECTS = struct.Struct("<I")
+S_ACK = struct.Struct("<B")
+
+F_BLINK     = 0x01
+F_STACK     = 0x02
+F_PLAN      = 0x04
+F_FADEIN    = 0x08
+F_FADEOUT   = 0x10  # &fadeout
+F_NOFADEOUT = 0x20  # !fadeout
+FLAGS = {
+    "blink": F_BLINK,
+    "stack": F_STACK,
+    "plan": F_PLAN,
+    "fadein": F_FADEIN,
+}
+
+KEEP_ALIVE_DEFAULT = 0xFF   # No keepalive= given.
+
+ACK_TYPES = ["ok", "no", "error", "bye"]
+
+def pack_record(rec_type, payload):
+    return REC_HEADER.pack(len(payload), rec_type) + payload
+
+def pack_objects(objects):
+    mask = 0
+    for obj in objects:
+        mask |= 1 << obj
+    return mask
+
+def unpack_objects(mask):
+    return [i for i in range(S_OBJECTS.size * 8) if mask & (1 << i)]
+
+def pack_led(objects, rgb, keep_alive=None, flags=0):
+    if keep_alive is None:
+        keep_alive = KEEP_ALIVE_DEFAULT
+    return pack_record(REC_LED, S_LED.pack(
+        pack_objects(objects), *rgb, flags, keep_alive
+    ))
+
+def pack_frame(rgbs, keep_alive=None, flags=0):
+    if keep_alive is None:
+        keep_alive = KEEP_ALIVE_DEFAULT
+    payload = [S_FRAME.pack(flags, keep_alive)]
+    payload.extend(S_RGB.pack(*rgb) for rgb in rgbs)
+    return pack_record(REC_FRAME, b"".join(payload))
+
+def pack_off(objects):
+    return pack_record(REC_OFF, S_OBJECTS.pack(pack_objects(objects)))
+
+def pack_pop(objects):
+    return pack_record(REC_POP, S_OBJECTS.pack(pack_objects(objects)))
+
+def pack_ack(type, freetext=""):
+    status = ACK_TYPES.index(strip_symbol(type, ":"))
+    return pack_record(REC_ACK, S_ACK.pack(status) + freetext.encode("utf-8"))
+
+def pack_text(line):
+    return pack_record(REC_TEXT, line.strip().encode("utf-8"))
+
+def pack_message(message):
+    """ Packs a message, or a string of one or more lines, into records.
+
+        Messages are packed into led, off, pop or ack records when they fit;
+        anything else, including every string, is packed into text records.
+    """
+    if isinstance(message, str):
+        return b"".join(
+            pack_text(line)
+            for line in message.splitlines()
+            if line.strip()
+        )
+
+    objects = message.objects()
+    fits_objects = all(0 <= o < S_OBJECTS.size * 8 for o in objects)
+    prefixes = message.prefixes()
+
+    if prefixes == ":led" and objects and fits_objects:
+        packed = pack_led_message(message)
+        if packed is not None:
+            return packed
+    if prefixes in (":off", ":pop") and objects and fits_objects \
+    and not message._values and not message._flags:
+        pack = pack_off if prefixes == ":off" else pack_pop
+        return pack(objects)
+    if message.type()[1:] in ACK_TYPES and not message.subtype() \
+    and not objects and not message._values and not message._flags:
+        return pack_ack(message.type(), message._freetext or "")
+    return pack_text(str(message))
+
+def pack_led_message(message):
+    rgb = message._values.get("rgb")
+    keep_alive = message._values.get("keepalive")
+    if not isinstance(rgb, list) or len(rgb) != 3 \
+    or not all(isinstance(c, int) and 0 <= c <= 255 for c in rgb):
+        return None
+    if set(message._values) - {"rgb", "keepalive"}:
+        return None
+    if keep_alive is not None \
+    and not (isinstance(keep_alive, int) and 0 <= keep_alive < 0xFF):
+        return None
+
+    flags = pack_flags(message._flags)
+    if flags is None:
+        return None
+    return pack_led(message.objects(), rgb, keep_alive, flags)
+
+def pack_flags(flags):
+    """ Packs flags, as stored in a message, into the flags of a record.
+        Returns None if there's a flag records can't hold.
+    """
+    result = 0
+    for flag, value in flags.items():
+        if flag == "fadeout":
+            result |= F_FADEOUT if value else F_NOFADEOUT
+        elif flag in FLAGS:
+            result |= FLAGS[flag] if value else 0
+        else:
+            return None
+    return result
+
+class RecordParser:
+    """ Splits a stream of bytes into records.
+
+        Feed it whatever came in, then iterate over records() to get the
+        type and a memoryview of the payload of each complete record.
+        Payloads are views into the parser's own buffer, so nothing is
+        copied; they are only valid until the next call to feed(), which
+        drops the records that were read from the buffer.
+    """
+    def __init__(self):
+        self._buffer = bytearray()
+        self._offset = 0
+
+    def feed(self, data):
+        if self._offset:
+            del self._buffer[0:self._offset]
+            self._offset = 0
+        self._buffer += data
+        return self
+
+    def records(self):
+        with memoryview(self._buffer) as view:
+            offset = self._offset
+            while offset + REC_HEADER.size <= len(view):
+                length, rec_type = REC_HEADER.unpack_from(view, offset)
+                start = offset + REC_HEADER.size
+                if start + length > len(view):
+                    break
+                offset = self._offset = start + length
+                yield rec_type, view[start:offset]